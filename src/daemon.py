@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
-from diskstats import Diskstats
+from diskstats import Diskstats, Stages
 from datetime import timedelta
 from glob import glob
-from time import sleep
+from time import sleep, monotonic
 import argparse
 import subprocess
 import signal
@@ -15,20 +15,31 @@ def sigint_handler(sig, frame):
     print("Exiting ...")
     if diskstats is not None:
         diskstats.save()
+        diskstats.close()
     exit(0)
 
 
+def oneshot(args, disknames):
+    # only the idle timers are recorded, no need to probe the disks
+    diskstats = Diskstats(filename=args.filename, disks=disknames, verbose=args.verbose, probe=False)
+    if args.verbose:
+        print("Disk Time idle      Last check")
+        print(diskstats)
+    diskstats.save()
+    diskstats.close()
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="daemon for running a sleeper tool to actually sleep the disks")
-    parser.add_argument("--timeout", "-t", help="Time in minutes before timeout occurs and disks go to sleep (s)", default=60)
-    parser.add_argument("--interval", "-i", help="Polling interval (s)", default=10)
-    parser.add_argument("--filename", "-f", help="Filename to store temporary data, usefull if something crashes and you autorestart and do not want to lose the timeout time", default="data.json")
+    parser.add_argument("--timeout", "-t", help="Time in minutes before timeout occurs and disks go to sleep (s)", default=60, type=int)
+    parser.add_argument("--interval", "-i", help="Polling interval (s)", default=10, type=int)
+    parser.add_argument("--filename", "-f", help="Filename to store temporary data (binary, an old data.json next to it is converted), usefull if something crashes and you autorestart and do not want to lose the timeout time", default="data.bin")
     parser.add_argument("--daemon", "-d", help="Make yourself angry and persistent", default=False, action="store_true")
     parser.add_argument("--verbose", "-v", help="Be verbose about it", default=False, action="store_true")
 
     # fetch all sdN from /dev
-    disknames = [n.split("/")[-1] for n in glob("/dev/sd?")]
+    disknames = [n.rpartition("/")[2] for n in glob("/dev/sd?")]
 
     # no longer needed
     # smartctl = subprocess.run(['smartctl', '--version'], stdout=subprocess.PIPE).stdout.decode()
@@ -38,21 +49,32 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    diskstats = Diskstats(filename=args.filename, disks=disknames, verbose=args.verbose)
+    if not args.daemon:
+        oneshot(args, disknames)
+        sys.exit(0)
+
+    diskstats = Diskstats(filename=args.filename, disks=disknames, verbose=args.verbose, status_ttl=timedelta(seconds=args.interval))
     signal.signal(signal.SIGINT, sigint_handler)
 
-    # start loop, check every n seconds
-    while True and args.daemon:
+    stages = Stages(standby_timeout=timedelta(minutes=args.timeout))
+    interval = timedelta(seconds=args.interval)
+
+    # start loop, update the timers every n seconds so activity is seen when it happens
+    # the disks are only queried once a timer runs out or a disk is staged
+    due = 0
+    while True:
         diskstats.update() # update timers
-        diskstats.check_power() # check for sleepy mode
-        stb = diskstats.set_standby(standby_timeout=timedelta(minutes=args.timeout))
-        if args.verbose:
-            print("Disk Time idle       Last check")
-            print(diskstats)
-            print(stb)
+        now = monotonic()
+        if now >= due:
+            diskstats.check_power(stages=stages) # check for sleepy mode
+            stb = diskstats.set_standby(stages=stages, report=args.verbose)
+            if args.verbose:
+                print("Disk Time idle       Last check")
+                print(diskstats)
+                print(stb)
+            due = now + diskstats.next_wake(interval, stages)
+        else:
+            # activity can only move the next check closer, never push it back
+            due = min(due, now + diskstats.next_wake(interval, stages))
+        # SIGINT interrupts the sleep through sigint_handler
         sleep(args.interval)
-
-    if args.verbose:
-        print("Disk Time idle      Last check")
-        print(diskstats)
-        diskstats.save()
@@ -1,11 +1,31 @@
 import sgio
 import struct
-from binascii import unhexlify, hexlify
+from binascii import hexlify
 import json
+import os
+import fcntl
 import subprocess
+from array import array
 from enum import Enum, IntEnum
 
 
+# precompiled layouts of the SCSI pages that are parsed
+_WORD = struct.Struct(">H")
+# stopped, reserved, standby, idle_a, idle_b, idle_c
+_RECOVERY_TIMES = struct.Struct(">HHHHHH")
+# idle_a, standby_z, idle_b, idle_c, standby_y
+_POWER_TIMERS = struct.Struct(">IIIII")
+
+# CDB layouts, opcode first
+_CDB6 = struct.Struct(">BBBBBB").pack
+_CDB6_LENGTH = struct.Struct(">BBBHB").pack
+_CDB10_LENGTH = struct.Struct(">BBBBBBBHB").pack
+_REQUEST_SENSE = _CDB6(0x03, 0x00, 0x00, 0x00, 0x20, 0x00)
+
+# what a refused or failed command raises, sgio has its own errors on a check condition
+_SGIO_ERRORS = (sgio.CheckConditionError, sgio.UnspecifiedError, OSError)
+
+
 class LedMode:
     OFF = "off"
     SLOW =  "rebuild"
@@ -14,6 +34,45 @@ class LedMode:
 
 
 
+class Ata:
+    HDIO_DRIVE_CMD = 0x031F
+    CHECK_POWER_MODE = 0xE5
+    # ATA PASS-THROUGH (16), PIO data-in, 1 block of 512 bytes, IDENTIFY DEVICE
+    IDENTIFY_CDB = bytes((0x85, 0x08, 0x0E, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xEC, 0x00))
+    # ATA PASS-THROUGH (16), non-data: IDLE IMMEDIATE, IDLE IMMEDIATE with UNLOAD FEATURE, STANDBY IMMEDIATE
+    IDLE_IMMEDIATE_CDB = bytes((0x85, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xE1, 0x00))
+    IDLE_UNLOAD_CDB = bytes((0x85, 0x06, 0x00, 0x00, 0x44, 0x00, 0x00, 0x00, 0x4C, 0x00, 0x4E, 0x00, 0x55, 0x00, 0xE1, 0x00))
+    STANDBY_IMMEDIATE_CDB = bytes((0x85, 0x06, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0xE0, 0x00))
+
+    # identify word 77 bits 1-3, current negotiated speed
+    SPEEDS = {1: 1.5, 2: 3.0, 3: 6.0}
+    # identify word 222 bits 0-10, transport major version
+    VERSIONS = ("ATA8-AST", "SATA 1.0a", "SATA II Ext", "SATA 2.5", "SATA 2.6", "SATA 3.0",
+                "SATA 3.1", "SATA 3.2", "SATA 3.3", "SATA 3.4", "SATA 3.5")
+
+    @staticmethod
+    def string(data, start, end):
+        # identify strings are stored as words, swap the bytes back
+        raw = data[start * 2:end * 2]
+        swapped = bytearray(len(raw))
+        swapped[0::2] = raw[1::2]
+        swapped[1::2] = raw[0::2]
+        return swapped.decode(errors="replace").strip()
+
+    @staticmethod
+    def word(data, index):
+        return struct.unpack_from("<H", data, index * 2)[0]
+
+
+class PowerState(IntEnum):
+    ACTIVE = 0
+    IDLE_A = 1
+    IDLE_B = 2
+    IDLE_C = 3
+    STANDBY_Y = 4
+    STANDBY_Z = 5
+
+
 class PowerCondition:
     #sas
     IDLE_A = (0x2, 0x0)
@@ -34,83 +93,86 @@ class PowerCondition:
     STANDBY = "-y"
     SLEEP = "-Y"
 
+    _SAS_TABLE = {
+        (PowerState.IDLE_A, False): IDLE_A,
+        (PowerState.IDLE_A, True): IDLE_A_FORCE,
+        (PowerState.IDLE_B, False): IDLE_B,
+        (PowerState.IDLE_B, True): IDLE_B_FORCE,
+        (PowerState.IDLE_C, False): IDLE_C,
+        (PowerState.IDLE_C, True): IDLE_C_FORCE,
+        (PowerState.STANDBY_Y, False): STANDBY_Y,
+        (PowerState.STANDBY_Y, True): STANDBY_Y_FORCE,
+        (PowerState.STANDBY_Z, False): STANDBY_Z,
+        (PowerState.STANDBY_Z, True): STANDBY_Z_FORCE,
+    }
+
+    # sleep is not used
+    _SATA_TABLE = {
+        PowerState.IDLE_A: IDLE_IMMEDIATE,
+        PowerState.IDLE_B: IDLE_UNLOAD,
+        PowerState.IDLE_C: IDLE_UNLOAD,
+        PowerState.STANDBY_Y: STANDBY,
+        PowerState.STANDBY_Z: STANDBY,
+    }
+
     @classmethod
     def set(cls, disktype, state, force=False):
-        if isinstance(disktype, SAS):
-            if state == PowerState.IDLE_A:
-                return cls.IDLE_A_FORCE if force else cls.IDLE_A
-            elif state == PowerState.IDLE_B:
-                return cls.IDLE_B_FORCE if force else cls.IDLE_B
-            elif state == PowerState.IDLE_C:
-                return cls.IDLE_C_FORCE if force else cls.IDLE_C
-            elif state == PowerState.STANDBY_Y:
-                return cls.STANDBY_Y_FORCE if force else cls.STANDBY_Y
-            elif state == PowerState.STANDBY_Z:
-                return cls.STANDBY_Z_FORCE if force else cls.STANDBY_Z
-        elif isinstance(disktype, SATA):
-            if state == PowerState.IDLE_A:
-                return cls.IDLE_IMMEDIATE
-            elif state == PowerState.IDLE_B or state == PowerState.IDLE_C:
-                return cls.IDLE_UNLOAD
-            elif state == PowerState.STANDBY_Y or state == PowerState.STANDBY_Z:
-                return cls.STANDBY
-            # sleep is not used
+        if disktype.is_scsi():
+            return cls._SAS_TABLE.get((state, force))
+        elif disktype.is_sata():
+            return cls._SATA_TABLE.get(state)
         return None
 
-class PowerState(IntEnum):
-    ACTIVE = 0
-    IDLE_A = 1
-    IDLE_B = 2
-    IDLE_C = 3
-    STANDBY_Y = 4
-    STANDBY_Z = 5
-
 
 class Generic:
-    name = None
-    devicename = None
-    path = None
-
-    vendor = None
-    serial = None
-    product = None
-
-    port = None
-    port_speed = None
-    port_type = None
-    interface = None
-
-    debug = True
-    disco = False
-
-    recovery_time = {
-        'stopped': 0,
-        'standby_z': 0,
-        'standby_y': 0,
-        'idle_a': 0,
-        'idle_b': 0,
-        'idle_c': 0
-    }
-
-    idle_a_en = 0
-    idle_b_en = 0
-    idle_c_en = 0
-    standby_y_en = 0
-    standby_z_en = 0
-    idle_a_timer = 0
-    idle_b_timer = 0
-    idle_c_timer = 0
-    standby_y_timer = 0
-    standby_z_timer = 0
-
-    powerstate = PowerState.ACTIVE # keep track for idle
+    __slots__ = (
+        'name', 'devicename', 'path',
+        'vendor', 'serial', 'product',
+        'port', 'port_speed', 'port_type', 'interface',
+        'debug', 'disco', 'device',
+        'recovery_time',
+        '_pc_flags',
+        'idle_a_timer', 'idle_b_timer', 'idle_c_timer', 'standby_y_timer', 'standby_z_timer',
+        'powerstate', 'powerstate_set',
+    )
 
     def __init__(self, name, path=None, debug=False, disco=False):
         self.name = name
         self.path = path if path is not None else "/dev/" + name
-        self.devicename = self.path.split("/")[-1]
+        self.devicename = self.path.rpartition("/")[2]
         self.debug = debug
         self.disco = disco
+        self.device = None  # device file, opened once and reused for every command
+
+        self.vendor = None
+        self.serial = None
+        self.product = None
+
+        self.port = None
+        self.port_speed = None
+        self.port_type = None
+        self.interface = None
+
+        self.recovery_time = {
+            'stopped': 0,
+            'standby_z': 0,
+            'standby_y': 0,
+            'idle_a': 0,
+            'idle_b': 0,
+            'idle_c': 0
+        }
+
+        # power condition mode page bytes 14 (low) and 15 (high), the *_en values are read from it
+        self._pc_flags = 0
+        self.idle_a_timer = 0
+        self.idle_b_timer = 0
+        self.idle_c_timer = 0
+        self.standby_y_timer = 0
+        self.standby_z_timer = 0
+
+        self.powerstate = PowerState.ACTIVE  # keep track for idle
+        self.powerstate_set = PowerState.ACTIVE
+
         if self.debug:
             print("Device %s, %s" % (self.name, self.path))
 
@@ -119,6 +181,26 @@ class Generic:
         self._get_link()
         self._get_power_control()
 
+    @property
+    def standby_y_en(self):
+        return self._pc_flags & 1
+
+    @property
+    def standby_z_en(self):
+        return (self._pc_flags >> 8) & 1
+
+    @property
+    def idle_a_en(self):
+        return (self._pc_flags >> 9) & 1
+
+    @property
+    def idle_b_en(self):
+        return (self._pc_flags >> 10) & 1
+
+    @property
+    def idle_c_en(self):
+        return (self._pc_flags >> 11) & 1
+
     def is_scsi(self):
         return False
 
@@ -147,8 +229,7 @@ class Generic:
         return self._rate()
 
     def power_set(self, state, force=False):
-        self._power_set(state, force=force)
-        self.power_state()
+        self._power_set(state, force=force)  # verifies the state itself
         if self.disco:
             if self.powerstate == PowerState.IDLE_B:
                 self.blink(mode=LedMode.SLOW)
@@ -169,50 +250,69 @@ class Generic:
     def blink(self, mode=LedMode.OFF):
         self._led(mode=mode)
 
+    def _device(self):
+        if self.device is None:
+            self.device = os.fdopen(os.open(self.path, os.O_RDONLY | os.O_NONBLOCK), "rb", buffering=0)
+        return self.device
+
+    def close(self):
+        if self.device is not None:
+            self.device.close()
+            self.device = None
+
 
 
 class SAS(Generic):
-    address = None
+    __slots__ = ('address', '_rx', '_inquiry_cache')
+
+    rates = {
+        0x08: "1.5 Gb/s",
+        0x09: "3 Gb/s",
+        0x0A: "6 Gb/s",
+        0x0B: "12 Gb/s",
+    }
+
+    port_types = {
+        0x08: "SAS",
+        0x09: "SAS1",
+        0x0A: "SAS2",
+        0x0B: "SAS3",
+    }
 
     def __init__(self, name, path=None, debug=False, disco=False):
+        self.address = None
+        self._rx = bytearray(255)  # receive buffer, reused for every command
+        self._inquiry_cache = {}
         super(SAS, self).__init__(name, path=path, debug=debug, disco=disco)
 
     def _rate(self):
-        if self.port_speed is None:
-            self._get_link()
-
-        if self.port_speed == 0x08:
-            return "1.5 Gb/s"
-        elif self.port_speed == 0x09:
-            return "3 Gb/s"
-        elif self.port_speed == 0x0A:
-            return "6 Gb/s"
-        elif self.port_speed == 0x0B:
-            return "12 Gb/s"
-        return "? Gb/s"
+        # port_speed is read once from the phy log page at init
+        return self.rates.get(self.port_speed, "? Gb/s")
 
     def is_scsi(self):
         return True
 
     def _raw_cmd(self, cmd, data, length=32):
-
-        with open(self.path, "rb") as f:
-            length = min(length + 32, 255)
-            rv = bytearray(length)
-            rv_length = sgio.execute(f, cmd, data, rv, max_sense_data_length=length)
-            if self.debug:
-                print("Received: [%d] %s" % (rv_length, hexlify(rv[:rv_length])))
-            return rv[:rv_length]
+        length = min(length + 32, 255)
+        rv = memoryview(self._rx)[:length]
+        rv_length = sgio.execute(self._device(), cmd, data, rv, max_sense_data_length=length)
+        if self.debug:
+            print("Received: [%d] %s" % (rv_length, hexlify(rv[:rv_length])))
+        return bytes(rv[:rv_length])
 
     def _inquiry(self, evpd, page, length):
-        cmd = unhexlify("12%02X%02X%04X00" % (evpd, page, length))
-        if self.debug:
-            print(hexlify(cmd))
-        data = self._raw_cmd(cmd, None, 255)
-        return data[:length]
+        # inquiry data is static for the lifetime of the disk
+        key = (evpd, page, length)
+        if key not in self._inquiry_cache:
+            cmd = _CDB6_LENGTH(0x12, evpd, page, length, 0x00)
+            if self.debug:
+                print(hexlify(cmd))
+            data = self._raw_cmd(cmd, None, 255)
+            self._inquiry_cache[key] = data[:length]
+        return self._inquiry_cache[key]
 
     def _log_sense(self, page, subpage, length):
-        cmd = unhexlify("4D00%02X%02X000000%04X00" % (page | 0b01000000, subpage, length))
+        cmd = _CDB10_LENGTH(0x4D, 0x00, page | 0b01000000, subpage, 0x00, 0x00, 0x00, length, 0x00)
         if self.debug:
             print(hexlify(cmd))
         data = self._raw_cmd(cmd, None, 255)
@@ -224,14 +324,14 @@ class SAS(Generic):
         # pc 2 = default value
         # pc 3 = saved value
         pc = pc << 6
-        cmd = unhexlify("1A00%02X%02X%02X00" % (page | pc, subpage, length))
+        cmd = _CDB6(0x1A, 0x00, page | pc, subpage, length, 0x00)
         if self.debug:
             print(hexlify(cmd))
         data = self._raw_cmd(cmd, None, 255)
         return data[:length]
 
     def _request_sense(self):
-        cmd = unhexlify("030000002000")
+        cmd = _REQUEST_SENSE
         if self.debug:
             print(hexlify(cmd))
         data = self._raw_cmd(cmd, None, 32)
@@ -240,11 +340,11 @@ class SAS(Generic):
     def _send_diagnostics(self, fc, pf, pl):
         fc = (fc << 6) & 0b11000000
         pf = (pf << 4) & 0b00010000
-        cmd = unhexlify("1D%02X00%04X00" % (fc | pf, pl & 0xFFFF))
+        cmd = _CDB6_LENGTH(0x1D, fc | pf, 0x00, pl & 0xFFFF, 0x00)
         if self.debug:
             print(hexlify(cmd))
         data = self._raw_cmd(cmd, None, 255)
-        return data[:length]
+        return data
 
     def _get_serial(self):
         data = self._inquiry(0, 0, 44)
@@ -266,12 +366,13 @@ class SAS(Generic):
         idle_c_s = data[5] & 0b00000100
         standby_y_s = data[4] & 0b00000010
         standby_z_s = data[4] & 0b00000001
-        self.recovery_time['idle_a'] = struct.unpack(">H", data[12:14])[0] / 1000.0 if idle_a_s else -1
-        self.recovery_time['idle_b'] = struct.unpack(">H", data[14:16])[0] / 1000.0 if idle_b_s else -1
-        self.recovery_time['idle_c'] = struct.unpack(">H", data[16:18])[0] / 1000.0 if idle_c_s else -1
-        self.recovery_time['standby_y'] = struct.unpack(">H", data[10:12])[0] / 1000.0 if standby_y_s else -1
-        self.recovery_time['standby_z'] = struct.unpack(">H", data[10:12])[0] / 1000.0 if standby_z_s else -1
-        self.recovery_time['stopped'] = struct.unpack(">H", data[6:8])[0] / 1000.0
+        stopped, _, standby, idle_a, idle_b, idle_c = _RECOVERY_TIMES.unpack_from(data, 6)
+        self.recovery_time['idle_a'] = idle_a / 1000.0 if idle_a_s else -1
+        self.recovery_time['idle_b'] = idle_b / 1000.0 if idle_b_s else -1
+        self.recovery_time['idle_c'] = idle_c / 1000.0 if idle_c_s else -1
+        self.recovery_time['standby_y'] = standby / 1000.0 if standby_y_s else -1
+        self.recovery_time['standby_z'] = standby / 1000.0 if standby_z_s else -1
+        self.recovery_time['stopped'] = stopped / 1000.0
 
         if self.debug:
             print(self.recovery_time)
@@ -280,16 +381,12 @@ class SAS(Generic):
         data = self._mode_sense(0, 0x1a, 0x00, 0x26)
         # 12
         pm_bg = (0b11000000 & data[14]) >> 6
-        self.standby_y_en = 0b00000001 & data[14]
-        self.standby_z_en = 0b00000001 & data[15]
-        self.idle_c_en = (0b00001000 & data[15]) >> 3
-        self.idle_b_en = (0b00000100 & data[15]) >> 2
-        self.idle_a_en = (0b00000010 & data[15]) >> 1
-        self.idle_a_timer = struct.unpack(">I", data[16:20])[0]
-        self.standby_z_timer = struct.unpack(">I", data[20:24])[0]
-        self.idle_b_timer = struct.unpack(">I", data[24:28])[0]
-        self.idle_c_timer = struct.unpack(">I", data[28:32])[0]
-        self.standby_y_timer = struct.unpack(">I", data[32:36])[0]
+        self._pc_flags = (data[15] << 8) | data[14]
+        (self.idle_a_timer,
+         self.standby_z_timer,
+         self.idle_b_timer,
+         self.idle_c_timer,
+         self.standby_y_timer) = _POWER_TIMERS.unpack_from(data, 16)
 
         if self.debug:
             print("IDLE_A: %d %d" % (self.idle_a_en, self.idle_a_timer))
@@ -300,19 +397,12 @@ class SAS(Generic):
 
     def _get_link(self):
         data = self._log_sense(0x18, 0x00, 0xd8)
-        phy_port = struct.unpack(">H", data[4:6])[0]
+        phy_port = _WORD.unpack_from(data, 4)[0]
         phy_nr = data[11]
-        self.port_type = phy_type = (data[16] & 0b01110000) >> 4
+        phy_type = (data[16] & 0b01110000) >> 4
         # port type is not usefull in our sense
         self.port_speed = phy_rate = data[17] & 0b00001111
-        if phy_rate == 0x8:
-            self.port_type = "SAS"
-        elif phy_rate == 0x9:
-            self.port_type = "SAS1"
-        elif phy_rate == 0xA:
-            self.port_type = "SAS2"
-        elif phy_rate == 0xB:
-            self.port_type = "SAS3"
+        self.port_type = self.port_types.get(phy_rate, phy_type)
         self.address = address = data[20:28]
 
         if self.debug:
@@ -321,7 +411,7 @@ class SAS(Generic):
 
 
     def _set_start_stop(self, pc, pm):
-        cmd = unhexlify("1B00000%1X%1X000" % (pm, pc))
+        cmd = _CDB6(0x1B, 0x00, 0x00, pm & 0x0F, (pc & 0x0F) << 4, 0x00)
         if self.debug:
             print(hexlify(cmd))
         data = self._raw_cmd(cmd, None, 32)
@@ -367,17 +457,54 @@ class SATA(Generic):
     ## idle_c == standby_y is standby
     ## standby_z is standby, sleep is power off will not use
 
-    powerstate_set = PowerState.ACTIVE
+    __slots__ = ('_identify_data', '_smartctl_data')
+
+    # CHECK POWER MODE sector count values, 0xFF and 0x80 are handled separately
+    # anything else, like 0x41 (NV cache with the spindle spun up), counts as active
+    power_modes = {
+        0x00: PowerState.STANDBY_Z,
+        0x01: PowerState.STANDBY_Y,
+        0x40: PowerState.STANDBY_Z,
+        0x81: PowerState.IDLE_A,
+        0x82: PowerState.IDLE_B,
+        0x83: PowerState.IDLE_C,
+    }
+
+    # the hdparm flags of PowerCondition as direct commands
+    ata_commands = {
+        PowerCondition.IDLE_IMMEDIATE: Ata.IDLE_IMMEDIATE_CDB,
+        PowerCondition.IDLE_UNLOAD: Ata.IDLE_UNLOAD_CDB,
+        PowerCondition.STANDBY: Ata.STANDBY_IMMEDIATE_CDB,
+    }
 
     def __init__(self, name, path=None, debug=False, disco=False):
+        self._identify_data = None
+        self._smartctl_data = None
         super(SATA, self).__init__(name, path=path, debug=debug, disco=disco)
 
+    def _ata_check_power_mode(self):
+        args = array('B', [Ata.CHECK_POWER_MODE, 0, 0, 0])
+        fcntl.ioctl(self._device(), Ata.HDIO_DRIVE_CMD, args)
+        # sector count is returned in the third byte
+        return args[2]
 
     def _power_state(self):
-        mode = self._cmd_hdparm(operants=['-C'])
-        if "active" in mode:
+        try:
+            mode = self._ata_check_power_mode()
+        except OSError:
+            return self._power_state_hdparm()
+
+        if mode == 0xFF or mode == 0x80:
             # all idle modes report this as well as active, assume it went into mode we set
             self.powerstate = self.powerstate_set if self.powerstate_set is not None else PowerState.ACTIVE
+        else:
+            self.powerstate = self.power_modes.get(mode, PowerState.ACTIVE)
+        return self.powerstate
+
+    def _power_state_hdparm(self):
+        mode = self._cmd_hdparm(operants=('-C',))
+        if "active" in mode:
+            self.powerstate = self.powerstate_set if self.powerstate_set is not None else PowerState.ACTIVE
         elif "standby" in mode:
             self.powerstate = PowerState.STANDBY_Z
         else:
@@ -385,7 +512,13 @@ class SATA(Generic):
         return self.powerstate
 
     def _power_set(self, state, force=False):
-        self._cmd_hdparm(operants=[PowerCondition.set(self, state)])
+        condition = PowerCondition.set(self, state)
+        cdb = self.ata_commands[condition]
+        try:
+            sgio.execute(self._device(), cdb, None, None)
+        except _SGIO_ERRORS:
+            # the pass-through was refused, let hdparm have a go
+            self._cmd_hdparm(operants=(condition,))
         self.powerstate_set = state
         self._power_state() # verify
         if self.debug:
@@ -394,8 +527,32 @@ class SATA(Generic):
     def is_sata(self):
         return True
 
+    def _identify(self):
+        if self._identify_data is None:
+            data = bytearray(512)
+            try:
+                sgio.execute(self._device(), Ata.IDENTIFY_CDB, None, data)
+                self._identify_data = data
+            except _SGIO_ERRORS:
+                # the pass-through was refused, fall back to smartctl
+                self._identify_data = False
+        return self._identify_data
+
+    def _smartctl(self):
+        if self._smartctl_data is None:
+            self._smartctl_data = self._cmd_smartctl(operants=('-x',))
+        return self._smartctl_data
+
     def _get_serial(self):
-        data = self._cmd_smartctl(operants=['-x'])
+        data = self._identify()
+        if data:
+            # model family is not part of identify, it comes from the smartctl database
+            self.vendor = ''
+            self.serial = Ata.string(data, 10, 20)
+            self.product = Ata.string(data, 27, 47)
+            return
+
+        data = self._smartctl()
         self.vendor = data['model_family'] if 'model_family' in data else ''
         self.serial = data['serial_number'] if 'serial_number' in data else ''
         self.product = data['model_name'] if 'model_name' in data else ''
@@ -404,22 +561,29 @@ class SATA(Generic):
         pass
 
     def _get_link(self):
-        data = self._cmd_smartctl(operants=['-x'])
+        data = self._identify()
+        if data:
+            self.port_speed = Ata.SPEEDS.get((Ata.word(data, 77) >> 1) & 0b111, 0)
+            transport = Ata.word(data, 222)
+            versions = transport & 0x07FF if transport != 0xFFFF else 0
+            self.port_type = Ata.VERSIONS[versions.bit_length() - 1] if versions else ''
+            return
+
+        data = self._smartctl()
         self.port_speed = data['interface_speed']['current']['units_per_second'] / 10.0 if 'interface_speed' in data else 0
         self.port_type = data['sata_version']['string'] if 'sata_version' in data else ''
 
     def _rate(self):
-        if self.port_speed is None:
-            self._get_link()
-
+        # port_speed is read once from identify (or smartctl) at init
         return "%.1f Gb/s" % (self.port_speed)
 
     def _get_power_control(self):
         pass
 
-    def _cmd_hdparm(self, operants=[]):
-        return subprocess.run(['hdparm'] + operants + [self.path], stdout=subprocess.PIPE).stdout.decode()
+    def _cmd_hdparm(self, operants=()):
+        return subprocess.run(('hdparm',) + operants + (self.path,), stdout=subprocess.PIPE).stdout.decode()
 
-    def _cmd_smartctl(self, operants=[]):
-        return json.loads(subprocess.run(['smartctl', '--json', '--nocheck=standby', self.path] + operants, stdout=subprocess.PIPE).stdout.decode())
+    def _cmd_smartctl(self, operants=()):
+        # json.loads takes the raw bytes
+        return json.loads(subprocess.run(('smartctl', '--json', '--nocheck=standby', self.path) + operants, stdout=subprocess.PIPE).stdout)
 
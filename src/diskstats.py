@@ -1,92 +1,266 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
-from binascii import hexlify
+import os
+import re
+import struct
+import time
+from array import array
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
 from disk import SATA, SAS, Generic, PowerState, PowerCondition
 
-class Diskstats:
-    disks = {}
-    filename = None
-    verbose = False
+# state file: header, then fixed size records appended on every save, the last record of a disk wins
+_STATE_HEADER = b"SPD\x01"
+# name, wall clock time of the last activity, reads completed, writes completed, protocol
+_STATE_NAME_SIZE = 32
+_STATE_RECORD = struct.Struct("<%dsdQQB7x" % _STATE_NAME_SIZE)
+_PROTOCOLS = (None, 'sata', 'sas')
+
+# major, minor, name and the counters of every /proc/diskstats line
+_DISKSTATS_LINE = re.compile(rb'^[ \t]*\d+[ \t]+\d+[ \t]+(\S+)[ \t]+(.*)$', re.MULTILINE)
+
+
+def _ns(td):
+    # idle accounting is done in integer monotonic nanoseconds, timeouts are converted once
+    return td // timedelta(microseconds=1) * 1000
+
+
+class Stages:
+    # idle timers (in ns) and the state a disk goes to when they run out, sorted by timer
+
+    def __init__(self, standby_timeout=timedelta(minutes=60), idle_c_timeout=timedelta(minutes=30), idle_b_timeout=timedelta(minutes=10), idle_a_timeout=timedelta(seconds=60)):  # noqa
+        standby_timeout = _ns(standby_timeout)
+        idle_c_timeout = _ns(idle_c_timeout)
+        idle_b_timeout = _ns(idle_b_timeout)
+        idle_a_timeout = _ns(idle_a_timeout)
+        table = sorted([
+            (idle_a_timeout, PowerState.IDLE_A),
+            (idle_b_timeout, PowerState.IDLE_B),
+            (idle_c_timeout, PowerState.IDLE_C),
+            (standby_timeout, PowerState.STANDBY_Z),
+        ])
+        self.thresholds = [threshold for threshold, state in table]
+        self.targets = [state for threshold, state in table]
+        self.standby_timeout = standby_timeout
+        # timer a disk has to pass before it may be in a state
+        self.required = {
+            PowerState.IDLE_A: idle_a_timeout,
+            PowerState.IDLE_B: idle_b_timeout,
+            PowerState.IDLE_C: idle_c_timeout,
+            PowerState.STANDBY_Y: idle_c_timeout,
+            PowerState.STANDBY_Z: standby_timeout,
+        }
+
+    def crossed(self, idle):
+        # states whose timer ran out, deepest first whatever the order of the timers
+        return sorted(self.targets[:bisect_left(self.thresholds, idle)], reverse=True)
+
 
-    def __init__(self, filename=None, disks=None, verbose=False):
+class Diskstats:
+    def __init__(self, filename=None, disks=None, verbose=False, status_ttl=timedelta(seconds=10), probe=True):
+        # probe=False only tracks the idle timers, disks are not queried and can not be put in standby
         self.disks = {}
+        # the same disks keyed on the raw name from /proc/diskstats, untracked rows are not decoded
+        self._by_name = {}
+        self.filename = None
         self.verbose = verbose
+        self.status_ttl = status_ttl
+        self.probe = probe
+        self._pool = None
+        # keep /proc/diskstats open, every tick seeks back and reads it again
+        self._procfile = open('/proc/diskstats', 'rb', buffering=0)
         if filename is not None:
             self.load(filename)
 
         if disks is None:
             self.update(reload=True)
         else:
-            for disk in disks:
-                if disk not in self.disks:
-                    self.disks[disk] = Disk(disk)
-                self.disks[disk].update()
+            self._add_disks((disk, {}) for disk in disks if disk not in self.disks)
+            self.update()
 
     def update(self, reload=False):
-        with open('/proc/diskstats', 'r') as f:
-            for line in f.readlines():
-                data = line[13:].split(' ')
-                if data[0] not in self.disks and reload:
-                    self.disks[data[0]] = Disk(data[0])
-                elif data[0] in self.disks:
-                    self.disks[data[0]].update()
+        # read /proc/diskstats once and hand each tracked disk its own row as the line comes by
+        # only the rows of tracked disks get their counters split
+        now = time.monotonic_ns()
+        new = {}
+        for m in _DISKSTATS_LINE.finditer(self._read_diskstats()):
+            disk = self._by_name.get(m.group(1))
+            if disk is not None:
+                disk.apply(m.group(2).split(), now)
+            elif reload:
+                new[m.group(1).decode()] = m.group(2)
+
+        if new:
+            self._add_disks((name, {}) for name in new)
+            for name, counters in new.items():
+                self.disks[name].apply(counters.split(), now)
+
+    def _read_diskstats(self):
+        # procfs hands out about a page per read, read() without a size keeps going until EOF
+        self._procfile.seek(0)
+        return self._procfile.read()
 
     def load(self, filename):
         try:
             self.filename = filename
-            with open(filename, "r") as f:
-                data = json.loads(f.read())
-
-                for name, value in data.items():
-                    self.disks[name] = Disk(name,
-                                            timestamp=value['time_last_check'],
-                                            current_reads_completed=value['current_reads_completed'],  # noqa
-                                            current_writes_completed=value['current_writes_completed'])  # noqa
+            # name -> (timestamp, reads completed, writes completed, protocol)
+            data = {}
+            try:
+                with open(filename, "rb") as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                # upgraded installs still have their state in the old json file, e.g. data.json for data.bin
+                legacy = os.path.splitext(filename)[0] + ".json"
+                if legacy == filename:
+                    raise
+                with open(legacy, "rb") as f:
+                    raw = f.read()
+
+            if raw.startswith(_STATE_HEADER):
+                body = memoryview(raw)[len(_STATE_HEADER):]
+                # drop a record cut short by a crash while saving
+                body = body[:len(body) - len(body) % _STATE_RECORD.size]
+                records = 0
+                for name, timestamp, reads, writes, protocol in _STATE_RECORD.iter_unpack(body):
+                    data[name.rstrip(b"\0").decode()] = (timestamp, reads, writes, _PROTOCOLS[protocol])
+                    records += 1
+                compact = records > len(data)
+            else:
+                # json (lines) written by older versions, convert it into filename
+                for line in raw.splitlines():
+                    if line.strip():
+                        for name, value in json.loads(line).items():
+                            data[name] = (value['time_last_check'],
+                                          value['current_reads_completed'],
+                                          value['current_writes_completed'],
+                                          value.get('protocol'))
+                compact = True
+
+            if compact:
+                # one record per disk
+                self._write_state(filename, "wb", ((name,) + value for name, value in data.items()))
+
+            self._add_disks((name, {
+                'timestamp': timestamp,
+                'current_reads_completed': reads,
+                'current_writes_completed': writes,
+                'protocol': protocol,
+            }) for name, (timestamp, reads, writes, protocol) in data.items())
         except FileNotFoundError:
             if self.verbose:
                 print("Failed to find file, assuming you make it when closing")
             pass
 
     def save(self, filename=None):
+        # appends a record for every disk, load() merges and compacts them
         if filename is None:
             filename = self.filename
 
         if filename is None:
             raise ValueError("Need a filename to store the data")
-        data = {}
-        for name, disk in self.disks.items():
-            data[name] = {
-                'time_last_check': datetime.timestamp(disk.time_last_check),
-                'current_reads_completed': disk.current_reads_completed,
-                'current_writes_completed': disk.current_writes_completed
-            }
-        with open(filename, "w") as f:
-            f.write(json.dumps(data))
-
-    def check_power(self):
-        for name, disk in self.disks.items():
-            disk.powerstatus()
-
-    def set_standby(self, standby_timeout=timedelta(minutes=60)):
-        s = "Setting disks in standby:\n"
+        now = time.monotonic_ns()
+        wall = time.time_ns()
+        self._write_state(filename, "ab", ((
+            name,
+            # wall clock time of the last activity, load() rebases it on the monotonic clock
+            disk.wall_last_check(now, wall),
+            disk.current_reads_completed,
+            disk.current_writes_completed,
+            'sas' if disk.sas else 'sata' if disk.sata else None,
+        ) for name, disk in self.disks.items()))
+
+    def _write_state(self, filename, mode, records):
+        # records is an iterable of (name, timestamp, reads completed, writes completed, protocol)
+        with open(filename, mode) as f:
+            if f.tell() == 0:
+                f.write(_STATE_HEADER)
+            for name, timestamp, reads, writes, protocol in records:
+                raw = name.encode()
+                if len(raw) > _STATE_NAME_SIZE:
+                    # pack would cut it short and it could collide with another disk on load
+                    if self.verbose:
+                        print("Disk name %s too long to store, skipping" % name)
+                    continue
+                f.write(_STATE_RECORD.pack(raw, timestamp, reads, writes, _PROTOCOLS.index(protocol)))
+
+    def close(self):
+        # let running workers finish with their device files before closing them
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
         for name, disk in self.disks.items():
-            r = disk.standby(standby_timeout=standby_timeout)
-            s = s + "%-4s " % (name) + r + "\n"
-        return s
+            disk.close()
+        self._procfile.close()
+
+    def _map(self, fn, items):
+        # disk work is spent waiting on subprocesses and device commands, run it side by side
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=32)
+        return list(self._pool.map(fn, items))
+
+    def _add_disks(self, disks):
+        # disks is an iterable of (name, kwargs)
+        for disk in self._map(lambda d: Disk(d[0], status_ttl=self.status_ttl, probe=self.probe, **d[1]), disks):
+            self.disks[disk.name] = disk
+            self._by_name[disk.name.encode()] = disk
+
+    def check_power(self, stages=None):
+        if stages is None:
+            stages = Stages()
+        now = time.monotonic_ns()
+        idle_a_timeout = stages.required[PowerState.IDLE_A]
+        # an active disk that has not reached the first idle timer cannot change state, don't poke it
+        disks = [disk for disk in self.disks.values() if not (disk.idle_ns(now) < idle_a_timeout and disk.status_code == PowerState.ACTIVE)]
+        self._map(lambda disk: disk.powerstatus(now), disks)
+
+    def next_wake(self, interval, stages):
+        # seconds until check_power and set_standby are needed again: the first disk crossing a timer it has
+        # not crossed yet, never sooner than interval and at most the standby timeout so disks woken up by
+        # someone else are picked up again. update() is not skipped, it keeps running every interval
+        interval = _ns(interval)
+        now = time.monotonic_ns()
+        wake = stages.standby_timeout
+        thresholds = stages.thresholds
+        targets = stages.targets
+        for disk in self.disks.values():
+            if disk.staged:
+                # staged disks get their command on the next tick
+                wake = interval
+                break
+            idle = now - disk.time_last_check_ns
+            powerstate = disk.disk.powerstate
+            if powerstate != PowerState.ACTIVE and idle < stages.required[powerstate]:
+                # activity since the state was read, the disk is spinning again
+                powerstate = PowerState.ACTIVE
+            # only timers that would put the disk in a deeper state matter
+            for threshold, target in zip(thresholds, targets):
+                if threshold >= idle and target > powerstate:
+                    wake = min(wake, threshold - idle)
+                    break
+        return max(interval, wake) / 1e9
+
+    def set_standby(self, standby_timeout=timedelta(minutes=60), stages=None, report=False):
+        # returns a report of what was done per disk if asked for, None otherwise
+        if stages is None:
+            stages = Stages(standby_timeout=standby_timeout)
+        now = time.monotonic_ns()
+        results = self._map(lambda disk: disk.standby(now, stages), self.disks.values())
+        if not report:
+            return None
+        return "Setting disks in standby:\n" + "".join("%-4s %s\n" % (name, r) for name, r in zip(self.disks, results))
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        s = ""
-        for disk in self.disks:
-            s += str(self.disks[disk]) + "\n"
-        return s
+        now = time.monotonic_ns()
+        wall = time.time_ns()
+        return "".join("%s\n" % (disk.describe(now, wall)) for disk in self.disks.values())
 
 
 class Disk:
-    fields = [
+    fields = (
         'reads_completed',
         'reads_merged',
         'sectors_read',
@@ -104,29 +278,57 @@ class Disk:
         'time_discarding',
         # 'flush_requests_completed',
         # 'time_flushing'
-    ]
-
-    current_reads_completed = 0
-    current_writes_completed = 0
-
-    time_last_check = 0
-    status = "UNKNOWN"
-    sata = False
-    sas = False
-    staged = False
-
-    def __init__(self, name, timestamp=None, current_reads_completed=0, current_writes_completed=0):  # noqa
+    )
+    # positions in counters of the values the idle tracking looks at
+    READS = fields.index('reads_completed')
+    WRITES = fields.index('writes_completed')
+    IN_PROGRESS = fields.index('ios_in_progress')
+
+    not_triggered = {
+        PowerState.IDLE_A: "idle_a",
+        PowerState.IDLE_B: "idle_b",
+        PowerState.IDLE_C: "idle_c",
+        PowerState.STANDBY_Y: "idle_c",
+        PowerState.STANDBY_Z: "standby",
+    }
+
+    __slots__ = (
+        'name', 'disk',
+        'time_last_check_ns',
+        'current_reads_completed', 'current_writes_completed',
+        'sas', 'sata', 'staged',
+        'status_code', 'status_ttl', '_status_ts',
+        'counters',
+    )
+
+    def __init__(self, name, timestamp=None, current_reads_completed=0, current_writes_completed=0, status_ttl=timedelta(seconds=10), protocol=None, probe=True):  # noqa
         # name is the drivename, data is the raw input from diskstats
-        self.time_idle = 0
-        self.time_last_check = datetime.utcnow() if timestamp is None else datetime.fromtimestamp(timestamp)  # noqa
+        # timestamp is the wall clock time of the last activity, rebase it on the monotonic clock
+        now = time.monotonic_ns()
+        if timestamp is None:
+            self.time_last_check_ns = now
+        else:
+            self.time_last_check_ns = now - max(0, time.time_ns() - int(timestamp * 1e9))
         self.current_reads_completed = current_reads_completed
         self.current_writes_completed = current_writes_completed
+        # all diskstats values in one unsigned 64 bit array, in the order of fields
+        self.counters = array('Q', bytes(8 * len(self.fields)))
         self.name = name
         self.sas = False
         self.sata = False
-        self.check_protocol()
-        self.update()
-        if self.sata:
+        self.status_code = None
+        self.status_ttl = _ns(status_ttl)
+        self._status_ts = None
+        if protocol is not None:
+            # protocol never changes, trust the stored value
+            self.sas = protocol == 'sas'
+            self.sata = not self.sas
+        elif probe:
+            self.check_protocol()
+
+        if not probe:
+            self.disk = None
+        elif self.sata:
             self.disk = SATA(name, disco=True)
         elif self.sas:
             self.disk = SAS(name, disco=True)
@@ -134,32 +336,35 @@ class Disk:
             self.disk = Generic(name, disco=True)
         self.staged = False
 
-    def update(self):
-        with open('/proc/diskstats', 'r') as f:
-            for line in f.readlines():
-                diskdata = line[13:].split(' ')
-                if diskdata[0].strip() == self.name:
-                    data = diskdata[1:]
+    def apply(self, data, now):
+        # data is the already split row from /proc/diskstats without major, minor and name
+        # newer kernels append flush fields, those are not tracked
+        if len(data) < len(self.fields):
+            raise ValueError("Number of fields does not match data input, kernel update?")  # noqa
 
-                    if len(data) != len(self.fields):
-                        raise ValueError("Number of fields does not match data input, kernel update?")  # noqa
+        counters = self.counters = array('Q', map(int, data[:len(self.fields)]))
 
-                    for i in range(0, len(data)):
-                        setattr(self, self.fields[i], int(data[i]))
+        if (counters[self.READS] > self.current_reads_completed
+                or counters[self.WRITES] > self.current_writes_completed
+                or counters[self.IN_PROGRESS] != 0):
+            self.time_last_check_ns = now
 
-                    if self.reads_completed > self.current_reads_completed or self.ios_in_progress != 0:
-                        self.time_last_check = datetime.utcnow()
-                    if self.writes_completed > self.current_writes_completed or self.ios_in_progress != 0:
-                        self.time_last_check = datetime.utcnow()
+        self.current_reads_completed = counters[self.READS]
+        self.current_writes_completed = counters[self.WRITES]
 
-                    self.current_reads_completed = self.reads_completed
-                    self.current_writes_completed = self.writes_completed
+    def idle_ns(self, now=None):
+        if now is None:
+            now = time.monotonic_ns()
+        return now - self.time_last_check_ns
 
-    def idle(self):
-        return datetime.utcnow() - self.time_last_check
+    def wall_last_check(self, now=None, wall=None):
+        # wall clock time in seconds, for display and the state file only
+        if wall is None:
+            wall = time.time_ns()
+        return (wall - self.idle_ns(now)) / 1e9
 
     def check_protocol(self):
-        data = subprocess.run(['smartctl', '-i', '/dev/%s' % self.name], stdout=subprocess.PIPE).stdout
+        data = subprocess.run(('smartctl', '-i', '/dev/' + self.name), stdout=subprocess.PIPE).stdout
         if b"Transport protocol" in data:
             self.sata = False
             self.sas = True
@@ -167,71 +372,68 @@ class Disk:
             self.sata = True
             self.sas = False
 
-    def __lt__(self, other):
-        return self.time_last_check < other.time_last_check
-
-    def __gt__(self, other):
-        return self.time_last_check > other.time_last_check
-
-    def __eq__(self, other):
-        return self.time_last_check == other.time_last_check
+    def describe(self, now=None, wall=None):
+        if now is None:
+            now = time.monotonic_ns()
+        return "%-4s %-14s %s" % (self.name,
+                                  timedelta(microseconds=self.idle_ns(now) // 1000),
+                                  datetime.fromtimestamp(self.wall_last_check(now, wall), timezone.utc))
 
     def __str__(self):
-        return "%-4s %-14s %s" % (self.name,
-                                  datetime.utcnow() - self.time_last_check,  # noqa
-                                  self.time_last_check)
+        return self.describe()
 
     def __repr__(self):
         return str(self)
 
-    def powerstatus(self):
-        return str(self.disk.power_state())
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
 
-    def standby(self, standby_timeout=timedelta(minutes=60), idle_c_timeout=timedelta(minutes=30), idle_b_timeout=timedelta(minutes=10), idle_a_timeout=timedelta(seconds=60)):
-        # sas is STANDBY xxxxxxxxxx (by command/timer)
-        # sata is STANDBY
-        # IDLE_b can be use to force, idle usually works. Idle_c == standby_y in my case
-        if self.idle() > standby_timeout and self.disk.powerstate < PowerState.STANDBY_Z:
-            if self.staged:
-                self.disk.power_set(PowerState.STANDBY_Z)
-                self.staged = False
-                return "STANDBY_Z issued"
-            else:
-                self.staged = True
-                return "STANDBY_Z Staged"
-        elif self.idle() > idle_c_timeout and self.disk.powerstate <= PowerState.IDLE_C:
-            if self.staged:
-                self.disk.power_set(PowerState.IDLE_C)
-                self.staged = False
-                return "IDLE_C Issued"
-            else:
-                self.staged = True
-                return "IDLE_C Staged"
-        elif self.idle() > idle_b_timeout and self.disk.powerstate <= PowerState.IDLE_B:
-            if self.staged:
-                self.staged = False
-                self.disk.power_set(PowerState.IDLE_B)
-                return "IDLE_B Issued"
-            else:
-                self.staged = True
-                return "IDLE_B Staged"
-        elif self.idle() > idle_a_timeout and self.disk.powerstate <= PowerState.IDLE_A:
-            if self.staged:
-                self.disk.power_set(PowerState.IDLE_A)
-                self.staged = False
-                return "IDLE_A Issued"
-            else:
-                self.staged = True
-                return "IDLE_A Staged"
-        elif self.disk.powerstate == PowerState.STANDBY_Z and self.idle() < standby_timeout:
-            return "Disk in standby but timer not triggered"
-        elif (self.disk.powerstate == PowerState.IDLE_C or self.disk.powerstate == PowerState.STANDBY_Y) and self.idle() < idle_c_timeout:
-            return "Disk in idle_c but timer not triggered"
-        elif self.disk.powerstate == PowerState.IDLE_B and self.idle() < idle_b_timeout:
-            return "Disk in idle_b but timer not triggered"
-        elif self.disk.powerstate == PowerState.IDLE_A and self.idle() < idle_a_timeout and "ACTIVE" not in self.status:
-            return "Disk in idle_a but timer not triggered"
-        return "Disk in %s mode" % (self.disk.powerstate)
+    def powerstatus(self, now=None):
+        # only query the disk when the cached status is older than the ttl
+        if now is None:
+            now = time.monotonic_ns()
+        if self._status_ts is None or now - self._status_ts >= self.status_ttl:
+            self._set_status(self.disk.power_state(), now)
+        return self.status
+
+    @property
+    def status(self):
+        return self.status_code.name if self.status_code is not None else "UNKNOWN"
 
+    def _set_status(self, state, now):
+        self.status_code = state
+        self._status_ts = now
 
+    def _issue(self, state, now):
+        # power_set verifies the new state, so the cached status is fresh afterwards
+        self.disk.power_set(state)
+        self._set_status(self.disk.powerstate, now)
 
+    def standby(self, now, stages=Stages()):
+        # sas is STANDBY xxxxxxxxxx (by command/timer)
+        # sata is STANDBY
+        # IDLE_b can be use to force, idle usually works. Idle_c == standby_y in my case
+        idle = now - self.time_last_check_ns
+        powerstate = self.disk.powerstate
+        for target in stages.crossed(idle):
+            if powerstate < target:
+                if self.staged:
+                    self._issue(target, now)
+                    self.staged = False
+                    return "%s Issued" % (target.name)
+                else:
+                    self.staged = True
+                    return "%s Staged" % (target.name)
+
+        # an idle_a disk that reports active again is just active
+        if (powerstate != PowerState.ACTIVE and idle < stages.required[powerstate]
+                and not (powerstate == PowerState.IDLE_A and self.status_code == PowerState.ACTIVE)):
+            return "Disk in %s but timer not triggered" % (self.not_triggered[powerstate])
+        return "Disk in %s mode" % (powerstate.name)
+
+
+# the diskstats values stay readable by name, e.g. disk.reads_completed
+for _index, _field in enumerate(Disk.fields):
+    setattr(Disk, _field, property(lambda self, index=_index: self.counters[index]))
+del _index, _field
@@ -1,7 +1,7 @@
 from diskstats import Diskstats, Disk
 from datetime import timedelta
 
-d = Diskstats(filename="data.json", disks=['sda',
+d = Diskstats(filename="data.bin", disks=['sda',
                                            'sdb',
                                            'sdc',
                                            'sdd',
@@ -19,6 +19,7 @@ d = Diskstats(filename="data.json", disks=['sda',
                                            'sdp'])
 d.update()
 d.check_power()
-d.set_standby(timeout=timedelta(minutes=30))
+d.set_standby(standby_timeout=timedelta(minutes=30))
 print(d)
-d.save("data.json")
+d.save("data.bin")
+d.close()